@@ -4,17 +4,42 @@ Generate ID cards pngs from a CSV file containing the name, year and cabin numbe
 """
 
 import argparse
+import csv
+import functools
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
-import pandas as pd
 
 HERE = Path(__file__).resolve().parent
 
-def load_font(ttf_path: Path, size: int):
+# Characters stripped from filenames; compiled once instead of per re.sub call.
+_UNSAFE = re.compile(r"[^\w\-\.]")
+
+# Each worker process decodes the template once and keeps a single scratch
+# card plus its ImageDraw; every row resets the scratch by blitting the
+# template back over it (a tight C memcpy), so no per-card buffer or Draw
+# object is ever allocated.
+_SCRATCH_CACHE = {}
+
+def get_scratch(template_path: str):
+    entry = _SCRATCH_CACHE.get(template_path)
+    if entry is None:
+        template = Image.open(template_path)
+        # Keep the alpha channel only if the template actually uses it;
+        # staying in RGB saves a quarter of the memory traffic per card.
+        has_alpha = "A" in template.getbands() and template.getchannel("A").getextrema()[0] < 255
+        template = template.convert("RGBA" if has_alpha else "RGB")
+        scratch = template.copy()
+        entry = (template, scratch, ImageDraw.Draw(scratch))
+        _SCRATCH_CACHE[template_path] = entry
+    return entry
+
+@functools.lru_cache(maxsize=128)
+def _load_font_cached(ttf_path: str, size: int):
     try:
-        return ImageFont.truetype(str(ttf_path), size)
+        return ImageFont.truetype(ttf_path, size)
     except Exception:
         # Fallback to a common built-in if Alice isn't found
         try:
@@ -22,32 +47,72 @@ def load_font(ttf_path: Path, size: int):
         except Exception:
             return ImageFont.load_default()
 
+def load_font(ttf_path: Path, size: int):
+    # Memoized per (path, size) so the TTF is parsed once, not once per row.
+    return _load_font_cached(str(ttf_path), size)
+
 def draw_bold_text(draw, position, text, font, fill="black", offset=1):
-    x, y = position
-    for dx in (-offset, 0, offset):
-        for dy in (-offset, 0, offset):
-            draw.text((x + dx, y + dy), text, font=font, fill=fill)
+    # stroke_width fattens the glyphs in one C-level pass instead of
+    # re-drawing the text at nine offsets.
+    draw.text(position, text, font=font, fill=fill, stroke_width=offset, stroke_fill=fill)
 
-def draw_bold_centered(draw, text, y, font, image_width, fill="black"):
-    bbox = draw.textbbox((0, 0), text, font=font)
+def draw_bold_centered(draw, text, y, font, image_width, fill="black", offset=1):
+    bbox = draw.textbbox((0, 0), text, font=font, stroke_width=offset)
     text_width = bbox[2] - bbox[0]
     x = int((image_width - text_width) // 2)
-    draw_bold_text(draw, (x, int(y)), text, font, fill=fill)
+    draw_bold_text(draw, (x, int(y)), text, font, fill=fill, offset=offset)
 
 def shrink_to_fit(draw, text, font_path: Path, max_width: int, start_size: int, min_size: int = 22):
-    size = start_size
-    while size >= min_size:
-        f = load_font(font_path, size)
+    # Most names obviously fit at start_size; a conservative per-character
+    # width estimate lets them skip the textbbox measurements entirely.
+    if len(text) * start_size * 0.6 <= max_width * 0.85:
+        return load_font(font_path, start_size)
+
+    # Text width is monotonic in font size, so binary-search the largest
+    # fitting size over the same 2-pt steps the old linear scan walked.
+    lo, hi = 0, (start_size - min_size) // 2
+    best = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        f = load_font(font_path, start_size - 2 * mid)
         w = draw.textbbox((0, 0), text, font=f)[2]
         if w <= max_width:
-            return f
-        size -= 2
-    return load_font(font_path, min_size)
+            best = f
+            hi = mid - 1
+        else:
+            lo = mid + 1
+    return best if best is not None else load_font(font_path, min_size)
 
 def safe_filename(s: str) -> str:
     # Keep letters, digits, underscores, hyphens; replace spaces with underscores
-    s = s.replace(" ", "_")
-    return re.sub(r"[^\w\-\.]", "", s)
+    return _UNSAFE.sub("", s.replace(" ", "_"))
+
+def render_card(task):
+    # Render a single card; runs in a worker process, so task is a flat tuple
+    # of plain strings/numbers that pickles cheaply.
+    (name, year, cabin, out_name, template_path, font_path, outdir,
+     name_y, year_y, cabin_y, name_size, year_size, cabin_size) = task
+
+    template, card, draw = get_scratch(template_path)
+    card.paste(template, (0, 0))  # reset the scratch card to a clean template
+    font_path = Path(font_path)
+    W = card.width
+
+    # Auto shrink long name to fit within 90% of card width
+    max_name_width = int(W * 0.9)
+    name_font = shrink_to_fit(draw, name, font_path, max_name_width, name_size)
+    year_font = load_font(font_path, year_size)
+    cabin_font = load_font(font_path, cabin_size)
+
+    draw_bold_centered(draw, name, y=name_y, font=name_font, image_width=W)
+    draw_bold_centered(draw, year, y=year_y, font=year_font, image_width=W)
+    draw_bold_centered(draw, f"Cabin: {cabin}", y=cabin_y, font=cabin_font, image_width=W)
+
+    out = Path(outdir) / out_name
+    # These PNGs are intermediates for the PDF layout step, so trade ~20%
+    # larger files for a much faster deflate pass.
+    card.save(out, format="PNG", compress_level=1, optimize=False)
+    return out.name
 
 def main():
     ap = argparse.ArgumentParser()
@@ -63,38 +128,27 @@ def main():
     ap.add_argument("--cabin_size", type=int, default=50)
     args = ap.parse_args()
 
-    df = pd.read_csv(args.csv)
-    template = Image.open(args.template).convert("RGBA")
-    font_path = Path(args.font)
+    # Three string columns is a job for the stdlib csv module; skipping the
+    # pandas import alone saves most of the script's cold-start time.
+    # utf-8-sig tolerates the BOM Excel puts at the front of the header row.
+    with open(args.csv, newline="", encoding="utf-8-sig") as f:
+        rows = [(row["Name"], row["Year"], row["Cabin"]) for row in csv.DictReader(f)]
 
     Path(args.outdir).mkdir(parents=True, exist_ok=True)
-
-    made = 0
-    for _, row in df.iterrows():
-        name = str(row["Name"])
-        year = str(row["Year"])
-        cabin = str(row["Cabin"])
-
-        card = template.copy()
-        draw = ImageDraw.Draw(card)
-        W = card.width
-
-        # Auto shrink long name to fit within 90% of card width
-        max_name_width = int(W * 0.9)
-        name_font = shrink_to_fit(draw, name, font_path, max_name_width, args.name_size)
-        year_font = load_font(font_path, args.year_size)
-        cabin_font = load_font(font_path, args.cabin_size)
-
-        draw_bold_centered(draw, name, y=args.name_y, font=name_font, image_width=W)
-        draw_bold_centered(draw, year, y=args.year_y, font=year_font, image_width=W)
-        draw_bold_centered(draw, f"Cabin: {cabin}", y=args.cabin_y, font=cabin_font, image_width=W)
-
-        out = Path(args.outdir) / f"{safe_filename(name)}_ID.png"
-        card.save(out)
-        made += 1
-        print(f"✓ Wrote {out.name}")
-
-    print(f"Done. Generated {made} card(s) into {args.outdir}")
+    # Resolve all output filenames in one pass here rather than per card in
+    # the workers.
+    tasks = [(name, year, cabin, f"{safe_filename(name)}_ID.png",
+              args.template, args.font, args.outdir,
+              args.name_y, args.year_y, args.cabin_y,
+              args.name_size, args.year_size, args.cabin_size)
+             for name, year, cabin in rows]
+
+    # Cards are independent, so fan the rendering out across all cores.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        for out_name in ex.map(render_card, tasks, chunksize=16):
+            print(f"✓ Wrote {out_name}")
+
+    print(f"Done. Generated {len(tasks)} card(s) into {args.outdir}")
 
 if __name__ == "__main__":
     main()
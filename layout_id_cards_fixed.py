@@ -3,7 +3,12 @@
 Layout the ID card.png images into a printable PDF grid with specified page dimensions and card sizes.
 """
 import argparse
+import math
 import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import repeat
 from pathlib import Path
 from reportlab.lib.pagesizes import letter, A4, landscape, portrait
 from reportlab.pdfgen import canvas
@@ -46,6 +51,9 @@ def parse_args():
     p.add_argument("--include-filenames", action="store_true",
                    help="Stamp small filenames below each card (for QA)")
 
+    p.add_argument("--no-compress", action="store_true",
+                   help="Skip Flate compression of page streams (faster debug runs, larger PDF)")
+
     return p.parse_args()
 
 def cm_to_points(x_cm: float) -> float:
@@ -74,31 +82,68 @@ def compute_auto_grid(page_w, page_h, margin_pts, card_w_pts, card_h_pts, spacin
     usable_h = page_h - 2 * margin_pts
 
     def max_fit(space, item):
-        n = 0
-        while True:
-            needed = n * item + max(0, n - 1) * spacing_pts
-            if needed <= space + 1e-6:
-                n += 1
-                continue
-            return max(1, n - 1)
+        # n items need n*item + (n-1)*spacing, so solve for n directly.
+        return max(1, int((space + spacing_pts + 1e-6) // (item + spacing_pts)))
 
     cols = max_fit(usable_w, card_w_pts)
     rows = max_fit(usable_h, card_h_pts)
     return rows, cols
 
-def place_image(c, img_path, x, y, box_w, box_h, fit_mode):
+def png_size(path):
+    # PNG dimensions sit at a fixed offset in the IHDR chunk, so 8 bytes of
+    # the file are enough — far cheaper than an Image.open just for size.
+    with open(path, "rb") as f:
+        f.seek(16)
+        return struct.unpack(">II", f.read(8))
+
+def get_image_size(path):
+    if Path(path).suffix.lower() == ".png":
+        try:
+            return png_size(path)
+        except Exception:
+            pass
+    with Image.open(path) as im:  # lazy: reads only the header
+        return im.size
+
+def preprocess_image(img_path: str, target_w_px: int, target_h_px: int):
+    # Decode one card image, downscale it to the print-target resolution and
+    # re-encode it to a JPEG buffer (PNG when it has real transparency).
+    # Runs in worker processes, so it returns plain bytes rather than an
+    # ImageReader.
+    try:
+        iw, ih = get_image_size(img_path)
+    except Exception as e:
+        print(f"Warning: failed to open {img_path}: {e}")
+        return None
+
+    # A JPEG already at or below print size can be embedded as-is, skipping
+    # the decode/re-encode round trip entirely.
+    if Path(img_path).suffix.lower() in (".jpg", ".jpeg") and iw <= target_w_px and ih <= target_h_px:
+        return Path(img_path).read_bytes()
+
     try:
         img = Image.open(img_path)
     except Exception as e:
         print(f"Warning: failed to open {img_path}: {e}")
+        return None
+    img.thumbnail((target_w_px, target_h_px), Image.LANCZOS)
+    buf = BytesIO()
+    if "A" in img.getbands():
+        img.save(buf, "PNG", compress_level=1)
+    else:
+        img.convert("RGB").save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+def place_image(c, reader, x, y, box_w, box_h, fit_mode):
+    if reader is None:
         return
 
-    iw, ih = img.size
+    iw, ih = reader.getSize()
     if iw == 0 or ih == 0:
         return
 
     if fit_mode == "stretch":
-        c.drawImage(ImageReader(img), x, y, width=box_w, height=box_h, preserveAspectRatio=False, mask='auto')
+        c.drawImage(reader, x, y, width=box_w, height=box_h, preserveAspectRatio=False, mask='auto')
         return
 
     box_ar = box_w / box_h
@@ -113,7 +158,7 @@ def place_image(c, img_path, x, y, box_w, box_h, fit_mode):
             draw_w = box_h * img_ar
         x_off = x + (box_w - draw_w) / 2.0
         y_off = y + (box_h - draw_h) / 2.0
-        c.drawImage(ImageReader(img), x_off, y_off, width=draw_w, height=draw_h, preserveAspectRatio=True, mask='auto')
+        c.drawImage(reader, x_off, y_off, width=draw_w, height=draw_h, preserveAspectRatio=True, mask='auto')
     else:  # cover (crop to fill)
         if img_ar > box_ar:
             draw_h = box_h
@@ -129,7 +174,7 @@ def place_image(c, img_path, x, y, box_w, box_h, fit_mode):
         path.rect(x, y, box_w, box_h)
         c.saveState()
         c.clipPath(path, stroke=0, fill=0)
-        c.drawImage(ImageReader(img), x_off, y_off, width=draw_w, height=draw_h, preserveAspectRatio=True, mask='auto')
+        c.drawImage(reader, x_off, y_off, width=draw_w, height=draw_h, preserveAspectRatio=True, mask='auto')
         c.restoreState()
 
 def layout_pdf(args):
@@ -162,7 +207,24 @@ def layout_pdf(args):
     start_y_top = page_h - ((page_h - total_grid_h) / 2.0)  # top of grid
 
     images = list_images(args.input)
-    c = canvas.Canvas(args.output, pagesize=(page_w, page_h))
+
+    # Downsample to 300 DPI at the printed card size; embedding anything
+    # larger inflates the PDF without adding print detail.
+    target_w_px = math.ceil(card_w_pts / 72 * 300)
+    target_h_px = math.ceil(card_h_pts / 72 * 300)
+
+    # The canvas itself is single-threaded, but decoding and re-encoding the
+    # card images is not: prep them all across cores up front so the page
+    # loop below only does geometry and PDF stream writes.
+    with ProcessPoolExecutor() as ex:
+        encoded = ex.map(preprocess_image, (str(p) for p in images),
+                         repeat(target_w_px), repeat(target_h_px), chunksize=8)
+        readers = {p: ImageReader(BytesIO(b)) if b is not None else None
+                   for p, b in zip(images, encoded)}
+
+    # pageCompression=None defers to the reportlab default for final runs.
+    c = canvas.Canvas(args.output, pagesize=(page_w, page_h),
+                      pageCompression=0 if args.no_compress else None)
 
     if args.include_filenames:
         try:
@@ -174,17 +236,19 @@ def layout_pdf(args):
     n = len(images)
     page_index = 0
 
+    # Cell geometry is the same on every page; compute it once.
+    xs = [start_x + col * (card_w_pts + spacing_pts) for col in range(cols)]
+    ys = [start_y_top - r * (card_h_pts + spacing_pts) - card_h_pts for r in range(rows)]
+
     while page_index * per_page < n:
-        for r in range(rows):
-            y = start_y_top - r * (card_h_pts + spacing_pts) - card_h_pts
-            for col in range(cols):
-                x = start_x + col * (card_w_pts + spacing_pts)
+        for r, y in enumerate(ys):
+            for col, x in enumerate(xs):
                 cell_index = r * cols + col if args.order == "row-major" else col * rows + r
                 img_index = page_index * per_page + cell_index
                 if img_index >= n:
                     continue
 
-                place_image(c, images[img_index], x, y, card_w_pts, card_h_pts, args.fit)
+                place_image(c, readers[images[img_index]], x, y, card_w_pts, card_h_pts, args.fit)
 
                 if args.include_filenames:
                     name = images[img_index].stem[:40]